@@ -1,17 +1,6 @@
-import os
-import json
-import requests
-from bs4 import BeautifulSoup
+import functools
+import sys
 import re
-import pickle
-from datetime import datetime, timedelta
-import traceback
-from ... import config
-
-# Path to store cached API documentation data
-CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cache')
-API_CACHE_FILE = os.path.join(CACHE_DIR, 'fusion360_api_cache.pickle')
-CACHE_EXPIRY_DAYS = 14  # Refresh cache every 2 weeks
 
 # Define the base URL and important sections of the Fusion 360 API documentation
 BASE_URL = "https://help.autodesk.com/view/fusion360/ENU/"
@@ -28,168 +17,128 @@ KEY_SECTIONS = {
     "construction": "GUID-713FE257-2161-46D3-9192-C881E1BF2951"
 }
 
-class FusionAPIDocs:
-    def __init__(self):
-        """Initialize the Fusion 360 API documentation retriever"""
-        self.api_docs = {}
-        self.common_errors = {}
-        self.best_practices = {}
-        
-        # Ensure cache directory exists
-        if not os.path.exists(CACHE_DIR):
-            os.makedirs(CACHE_DIR)
-        
-        # Try to load cached data or fetch fresh data
-        self._load_or_fetch_data()
-        
-    def _load_or_fetch_data(self):
-        """Load data from cache if available and not expired, otherwise fetch fresh data"""
-        if os.path.exists(API_CACHE_FILE):
-            try:
-                cache_age = datetime.now() - datetime.fromtimestamp(os.path.getmtime(API_CACHE_FILE))
-                
-                # If cache is still valid, load it
-                if cache_age.days < CACHE_EXPIRY_DAYS:
-                    with open(API_CACHE_FILE, 'rb') as f:
-                        cache_data = pickle.load(f)
-                        self.api_docs = cache_data.get('api_docs', {})
-                        self.common_errors = cache_data.get('common_errors', {})
-                        self.best_practices = cache_data.get('best_practices', {})
-                        
-                        # If cache loaded successfully, return
-                        if self.api_docs:
-                            return
-            except Exception as e:
-                print(f"Error loading cache: {str(e)}")
-        
-        # If we get here, we need to fetch fresh data
-        try:
-            self._fetch_api_documentation()
-            self._collect_common_errors()
-            self._collect_best_practices()
-            
-            # Save to cache
-            self._save_to_cache()
-        except Exception as e:
-            print(f"Error fetching API documentation: {str(e)}")
-            traceback.print_exc()
-    
-    def _fetch_api_documentation(self):
-        """Fetch API documentation from the Fusion 360 help site"""
-        # This is a simplified version - in a real implementation you would need to
-        # handle authentication, session management, and proper web scraping with rate limiting
-        
-        # For demonstration, we'll populate with some key information
-        # In a real implementation, you would scrape the actual documentation
-        
-        self.api_docs = {
-            "ExtrudeFeatures": {
-                "description": "Create extrusions from profiles",
-                "methods": {
-                    "createInput": {
-                        "description": "Creates an input object for an extrude feature",
-                        "parameters": "profile, operation",
-                        "returns": "ExtrudeFeatureInput",
-                        "example": "extrudeInput = extrudes.createInput(profile, adsk.fusion.FeatureOperations.NewBodyFeatureOperation)"
-                    },
-                    "add": {
-                        "description": "Creates an extrude feature",
-                        "parameters": "input",
-                        "returns": "ExtrudeFeature",
-                        "example": "extrudeFeature = extrudes.add(extrudeInput)"
-                    }
-                },
-                "common_errors": [
-                    "Profile must be closed for solid extrusion",
-                    "Cannot extrude a profile with zero area",
-                    "Profile must be on a single plane"
-                ],
-                "best_practices": [
-                    "Always validate that profiles exist before extruding",
-                    "Use ValueInput.createByReal() for simple distances",
-                    "Use ValueInput.createByString() for values with units"
-                ]
-            },
-            "RevolveFeatures": {
-                "description": "Create revolved features from profiles",
-                "methods": {
-                    "createInput": {
-                        "description": "Creates an input object for a revolve feature",
-                        "parameters": "profile, axis, operation",
-                        "returns": "RevolveFeatureInput",
-                        "example": "revolveInput = revolves.createInput(profile, axis, adsk.fusion.FeatureOperations.NewBodyFeatureOperation)"
-                    },
-                    "add": {
-                        "description": "Creates a revolve feature",
-                        "parameters": "input",
-                        "returns": "RevolveFeature",
-                        "example": "revolveFeature = revolves.add(revolveInput)"
-                    }
-                },
-                "common_errors": [
-                    "Axis cannot be tangent to the profile (ERROR 3: ASM_PATH_TANGENT)",
-                    "Axis cannot intersect the profile boundary",
-                    "Profile must be closed for solid revolution",
-                    "Revolution angle must be greater than zero"
-                ],
-                "best_practices": [
-                    "Always check axis position relative to profile",
-                    "For full revolutions, use an angle of 360 degrees",
-                    "For partial revolutions, use setAngleExtent() on the input object"
-                ]
+# Important Fusion 360 API terms to look for in queries; interned so
+# membership tests and index probes hit pointer-equality fast paths
+_KEY_API_TERMS = frozenset(sys.intern(t) for t in (
+    'extrude', 'revolve', 'sketch', 'profile', 'plane', 'feature',
+    'component', 'body', 'joint', 'assembly', 'parameter',
+    'pattern', 'circular', 'rectangular', 'mirror', 'fillet',
+    'chamfer', 'hole', 'thread', 'construction', 'offset', 'loft'
+))
+
+# Single alternation pattern so a query is scanned once for all terms
+# instead of once per term (sorted for a deterministic pattern)
+_KEY_TERMS_RE = re.compile('|'.join(sorted(_KEY_API_TERMS)))
+
+# The documentation data below is hardcoded, so it lives here as module-level
+# constants instead of being round-tripped through a disk cache on every init.
+# In a real implementation this would be replaced by scraping the actual
+# documentation (with authentication, session management and rate limiting).
+
+_API_DOCS = {
+    "ExtrudeFeatures": {
+        "description": "Create extrusions from profiles",
+        "methods": {
+            "createInput": {
+                "description": "Creates an input object for an extrude feature",
+                "parameters": "profile, operation",
+                "returns": "ExtrudeFeatureInput",
+                "example": "extrudeInput = extrudes.createInput(profile, adsk.fusion.FeatureOperations.NewBodyFeatureOperation)"
             },
-            "Sketches": {
-                "description": "Create and manage sketches on planes or planar faces",
-                "methods": {
-                    "add": {
-                        "description": "Creates a new sketch on a plane or face",
-                        "parameters": "planarEntity",
-                        "returns": "Sketch",
-                        "example": "sketch = sketches.add(planeXY)"
-                    }
-                },
-                "common_errors": [
-                    "Can only create sketch on planar surface or face",
-                    "Profile collection may be empty if sketch is not properly constrained"
-                ],
-                "best_practices": [
-                    "Always check if sketch contains profiles before using them",
-                    "Use sketch constraints to fully define important sketches",
-                    "For construction geometry, set isConstruction property to true"
-                ]
+            "add": {
+                "description": "Creates an extrude feature",
+                "parameters": "input",
+                "returns": "ExtrudeFeature",
+                "example": "extrudeFeature = extrudes.add(extrudeInput)"
             }
-        }
-    
-    def _collect_common_errors(self):
-        """Collect common Fusion 360 API errors and their solutions"""
-        self.common_errors = {
-            "ASM_PATH_TANGENT": {
-                "error_code": "ERROR 3: ASM_PATH_TANGENT",
-                "description": "The path is tangent to the profile. Try adjusting the path or rotating the profile.",
-                "context": "Revolve operations",
-                "solution": "Ensure the revolution axis is not tangent to any part of the profile. Move the axis away from the profile boundary."
-            },
-            "PROFILE_NOT_CLOSED": {
-                "error_code": "Failed to create extrude",
-                "description": "The profile is not closed or has zero area",
-                "context": "Extrude operations",
-                "solution": "Verify the sketch contains closed profiles with non-zero area. Check for small gaps in the sketch."
+        },
+        "common_errors": [
+            "Profile must be closed for solid extrusion",
+            "Cannot extrude a profile with zero area",
+            "Profile must be on a single plane"
+        ],
+        "best_practices": [
+            "Always validate that profiles exist before extruding",
+            "Use ValueInput.createByReal() for simple distances",
+            "Use ValueInput.createByString() for values with units"
+        ]
+    },
+    "RevolveFeatures": {
+        "description": "Create revolved features from profiles",
+        "methods": {
+            "createInput": {
+                "description": "Creates an input object for a revolve feature",
+                "parameters": "profile, axis, operation",
+                "returns": "RevolveFeatureInput",
+                "example": "revolveInput = revolves.createInput(profile, axis, adsk.fusion.FeatureOperations.NewBodyFeatureOperation)"
             },
-            "NULL_OBJECT_REFERENCE": {
-                "error_code": "NULL_OBJECT_REFERENCE",
-                "description": "A null object was referenced",
-                "context": "General API usage",
-                "solution": "Always check if objects exist before trying to use them. Use defensive programming with null checks."
+            "add": {
+                "description": "Creates a revolve feature",
+                "parameters": "input",
+                "returns": "RevolveFeature",
+                "example": "revolveFeature = revolves.add(revolveInput)"
             }
-        }
-    
-    def _collect_best_practices(self):
-        """Collect best practices for Fusion 360 API programming"""
-        self.best_practices = {
-            "error_handling": {
-                "title": "Error Handling",
-                "description": "Always implement proper error handling in Fusion 360 API code",
-                "example": """
+        },
+        "common_errors": [
+            "Axis cannot be tangent to the profile (ERROR 3: ASM_PATH_TANGENT)",
+            "Axis cannot intersect the profile boundary",
+            "Profile must be closed for solid revolution",
+            "Revolution angle must be greater than zero"
+        ],
+        "best_practices": [
+            "Always check axis position relative to profile",
+            "For full revolutions, use an angle of 360 degrees",
+            "For partial revolutions, use setAngleExtent() on the input object"
+        ]
+    },
+    "Sketches": {
+        "description": "Create and manage sketches on planes or planar faces",
+        "methods": {
+            "add": {
+                "description": "Creates a new sketch on a plane or face",
+                "parameters": "planarEntity",
+                "returns": "Sketch",
+                "example": "sketch = sketches.add(planeXY)"
+            }
+        },
+        "common_errors": [
+            "Can only create sketch on planar surface or face",
+            "Profile collection may be empty if sketch is not properly constrained"
+        ],
+        "best_practices": [
+            "Always check if sketch contains profiles before using them",
+            "Use sketch constraints to fully define important sketches",
+            "For construction geometry, set isConstruction property to true"
+        ]
+    }
+}
+
+_COMMON_ERRORS = {
+    "ASM_PATH_TANGENT": {
+        "error_code": "ERROR 3: ASM_PATH_TANGENT",
+        "description": "The path is tangent to the profile. Try adjusting the path or rotating the profile.",
+        "context": "Revolve operations",
+        "solution": "Ensure the revolution axis is not tangent to any part of the profile. Move the axis away from the profile boundary."
+    },
+    "PROFILE_NOT_CLOSED": {
+        "error_code": "Failed to create extrude",
+        "description": "The profile is not closed or has zero area",
+        "context": "Extrude operations",
+        "solution": "Verify the sketch contains closed profiles with non-zero area. Check for small gaps in the sketch."
+    },
+    "NULL_OBJECT_REFERENCE": {
+        "error_code": "NULL_OBJECT_REFERENCE",
+        "description": "A null object was referenced",
+        "context": "General API usage",
+        "solution": "Always check if objects exist before trying to use them. Use defensive programming with null checks."
+    }
+}
+
+_BEST_PRACTICES = {
+    "error_handling": {
+        "title": "Error Handling",
+        "description": "Always implement proper error handling in Fusion 360 API code",
+        "example": """
 def run(context):
     ui = None
     try:
@@ -200,11 +149,11 @@ def run(context):
         if ui:
             ui.messageBox('Failed:\\n{}'.format(traceback.format_exc()))
                 """
-            },
-            "validation": {
-                "title": "Input Validation",
-                "description": "Always validate inputs before performing operations",
-                "example": """
+    },
+    "validation": {
+        "title": "Input Validation",
+        "description": "Always validate inputs before performing operations",
+        "example": """
 # Check if sketch has profiles before extruding
 if sketch.profiles.count > 0:
     profile = sketch.profiles.item(0)
@@ -212,11 +161,11 @@ if sketch.profiles.count > 0:
 else:
     ui.messageBox('No valid profiles found in sketch')
                 """
-            },
-            "revolve_safety": {
-                "title": "Safe Revolve Operations",
-                "description": "Ensure revolve axes won't cause tangent errors",
-                "example": """
+    },
+    "revolve_safety": {
+        "title": "Safe Revolve Operations",
+        "description": "Ensure revolve axes won't cause tangent errors",
+        "example": """
 # Create a safe revolution axis away from the profile
 axis = sketch.sketchCurves.sketchLines.addByTwoPoints(
     adsk.core.Point3D.create(-10, 0, 0),
@@ -224,170 +173,245 @@ axis = sketch.sketchCurves.sketchLines.addByTwoPoints(
 )
 axis.isConstruction = True
                 """
-            }
+    }
+}
+
+@functools.lru_cache(maxsize=1)
+def get_docs():
+    """Return the process-wide FusionAPIDocs instance.
+
+    Callers should use this instead of constructing FusionAPIDocs directly
+    so repeated lookups share the same object.
+    """
+    return FusionAPIDocs()
+
+
+class FusionAPIDocs:
+    __slots__ = (
+        'api_docs', 'common_errors', 'best_practices',
+        '_term_to_apis', '_term_to_methods', '_term_to_errors',
+        '_term_to_practices', '_error_search_lower'
+    )
+
+    def __init__(self):
+        """Initialize the Fusion 360 API documentation retriever"""
+        self.api_docs = _API_DOCS
+        self.common_errors = _COMMON_ERRORS
+        self.best_practices = _BEST_PRACTICES
+
+        # Build a reverse index from key term to matching documentation so
+        # each query term becomes a dict probe instead of a nested scan.
+        self._build_term_index()
+
+    def _build_term_index(self):
+        """Index each key API term against the docs, errors and practices"""
+        self._term_to_apis = {}
+        self._term_to_methods = {}
+        self._term_to_errors = {}
+        self._term_to_practices = {}
+
+        # Lowercase every searchable string once instead of once per term
+        api_names_lower = {name: name.lower() for name in self.api_docs}
+        method_names_lower = {
+            (api_name, method_name): method_name.lower()
+            for api_name, api_info in self.api_docs.items()
+            for method_name in api_info.get('methods', {})
         }
-    
-    def _save_to_cache(self):
-        """Save the fetched data to the cache file"""
-        try:
-            cache_data = {
-                'api_docs': self.api_docs,
-                'common_errors': self.common_errors,
-                'best_practices': self.best_practices,
-                'timestamp': datetime.now()
-            }
-            
-            with open(API_CACHE_FILE, 'wb') as f:
-                pickle.dump(cache_data, f)
-        except Exception as e:
-            print(f"Error saving to cache: {str(e)}")
-    
+        error_context_lower = {
+            error_id: error_info['context'].lower()
+            for error_id, error_info in self.common_errors.items()
+        }
+        practice_description_lower = {
+            practice_id: practice_info['description'].lower()
+            for practice_id, practice_info in self.best_practices.items()
+        }
+
+        for term in _KEY_API_TERMS:
+            for api_name, name_lower in api_names_lower.items():
+                if term in name_lower:
+                    self._term_to_apis.setdefault(term, []).append(api_name)
+            for (api_name, method_name), name_lower in method_names_lower.items():
+                if term in name_lower:
+                    self._term_to_methods.setdefault(term, []).append((api_name, method_name))
+            for error_id, context_lower in error_context_lower.items():
+                if term in context_lower:
+                    self._term_to_errors.setdefault(term, []).append(error_id)
+            for practice_id, description_lower in practice_description_lower.items():
+                if term in description_lower:
+                    self._term_to_practices.setdefault(term, []).append(practice_id)
+
+        # Precomputed lowercase search strings for retrieve_error_solution
+        self._error_search_lower = [
+            (error_info['error_code'].lower(), error_info['description'].lower(), error_info)
+            for error_info in self.common_errors.values()
+        ]
+
     def retrieve_relevant_docs(self, query):
         """
         Retrieve relevant API documentation based on a query
-        
+
         Args:
             query (str): The user query or code context
-        
+
         Returns:
             dict: Relevant documentation sections
         """
-        query = query.lower()
+        return self._collect_docs(self._extract_key_terms(query))
+
+    def retrieve_relevant_docs_batch(self, queries):
+        """
+        Retrieve relevant API documentation for several queries at once
+
+        Term extraction and the postings walk run once over the union of
+        key terms, so a message plus its error context cost no more than
+        a single query.
+
+        Args:
+            queries (iterable): User queries or code/error contexts;
+                falsy entries are skipped
+
+        Returns:
+            dict: Relevant documentation sections
+        """
+        key_terms = list(dict.fromkeys(
+            term for query in queries if query
+            for term in _KEY_TERMS_RE.findall(query.lower())))
+        return self._collect_docs(key_terms)
+
+    def _collect_docs(self, key_terms):
+        """Union the precomputed postings lists for the given terms"""
         results = {}
-        
-        # Extract key terms from the query
-        key_terms = self._extract_key_terms(query)
-        
-        # Find API documentation related to these terms
+        matched_errors = set()
+        matched_practices = set()
         for term in key_terms:
-            # Look for matches in API docs
-            for api_name, api_info in self.api_docs.items():
-                if term in api_name.lower():
-                    results[api_name] = api_info
-                
-                # Also look in the methods
-                for method_name, method_info in api_info.get('methods', {}).items():
-                    if term in method_name.lower():
-                        if api_name not in results:
-                            results[api_name] = {'methods': {}}
-                        if 'methods' not in results[api_name]:
-                            results[api_name]['methods'] = {}
-                        results[api_name]['methods'][method_name] = method_info
-        
-        # Find relevant error information
-        for error_id, error_info in self.common_errors.items():
-            if any(term in error_info['context'].lower() for term in key_terms):
-                if 'relevant_errors' not in results:
-                    results['relevant_errors'] = []
-                results['relevant_errors'].append(error_info)
-        
-        # Find relevant best practices
-        for practice_id, practice_info in self.best_practices.items():
-            if any(term in practice_info['description'].lower() for term in key_terms):
-                if 'best_practices' not in results:
-                    results['best_practices'] = []
-                results['best_practices'].append(practice_info)
-        
+            for api_name in self._term_to_apis.get(term, ()):
+                results[api_name] = self.api_docs[api_name]
+
+            for api_name, method_name in self._term_to_methods.get(term, ()):
+                entry = results.setdefault(api_name, {})
+                if entry is self.api_docs[api_name]:
+                    # Full API info already included; don't mutate the
+                    # shared docs dict by inserting into its methods
+                    continue
+                entry.setdefault('methods', {})[method_name] = self.api_docs[api_name]['methods'][method_name]
+
+            matched_errors.update(self._term_to_errors.get(term, ()))
+            matched_practices.update(self._term_to_practices.get(term, ()))
+
+        # Add relevant error information (in stable dict order)
+        if matched_errors:
+            results['relevant_errors'] = [
+                error_info for error_id, error_info in self.common_errors.items()
+                if error_id in matched_errors
+            ]
+
+        # Add relevant best practices
+        if matched_practices:
+            results['best_practices'] = [
+                practice_info for practice_id, practice_info in self.best_practices.items()
+                if practice_id in matched_practices
+            ]
+
         return results
-    
+
     def retrieve_error_solution(self, error_message):
         """
         Find solutions for specific error messages
-        
+
         Args:
             error_message (str): The error message text
-        
+
         Returns:
             dict: Error information and solution if found
         """
         error_message = error_message.lower()
-        
-        for error_id, error_info in self.common_errors.items():
-            if error_info['error_code'].lower() in error_message or error_info['description'].lower() in error_message:
+
+        for error_code_lower, description_lower, error_info in self._error_search_lower:
+            if error_code_lower in error_message or description_lower in error_message:
                 return error_info
-        
+
         return None
-    
+
     def _extract_key_terms(self, query):
         """Extract key API-related terms from a query"""
-        # List of important Fusion 360 API terms to look for
-        key_api_terms = [
-            'extrude', 'revolve', 'sketch', 'profile', 'plane', 'feature', 
-            'component', 'body', 'joint', 'assembly', 'parameter', 
-            'pattern', 'circular', 'rectangular', 'mirror', 'fillet', 
-            'chamfer', 'hole', 'thread', 'construction', 'offset', 'loft'
-        ]
-        
-        # Find all terms in the query
-        found_terms = []
-        for term in key_api_terms:
-            if term in query.lower():
-                found_terms.append(term)
-        
-        return found_terms
-    
+        # One pass over the query; dedupe while keeping first-seen order
+        return list(dict.fromkeys(_KEY_TERMS_RE.findall(query.lower())))
+
     def format_as_context(self, relevant_docs):
         """
         Format the retrieved documentation for use as context in the LLM prompt
-        
+
         Args:
             relevant_docs (dict): The relevant documentation sections
-        
+
         Returns:
             str: Formatted context text
         """
-        context = "FUSION 360 API DOCUMENTATION:\n\n"
-        
+        return "".join(self.format_as_context_iter(relevant_docs))
+
+    def format_as_context_iter(self, relevant_docs):
+        """
+        Yield the formatted documentation context piece by piece
+
+        Callers that write to a file or stream can consume the iterator
+        directly without materializing the full context string.
+
+        Args:
+            relevant_docs (dict): The relevant documentation sections
+
+        Returns:
+            Iterator[str]: Successive fragments of the context text
+        """
+        yield "FUSION 360 API DOCUMENTATION:\n\n"
+
         # Format API docs
         for api_name, api_info in relevant_docs.items():
             if api_name not in ['relevant_errors', 'best_practices']:
-                context += f"## {api_name}\n"
+                yield f"## {api_name}\n"
                 if 'description' in api_info:
-                    context += f"{api_info['description']}\n\n"
-                
+                    yield f"{api_info['description']}\n\n"
+
                 # Add methods if available
                 if 'methods' in api_info:
                     for method_name, method_info in api_info['methods'].items():
-                        context += f"### {method_name}\n"
-                        context += f"Description: {method_info['description']}\n"
-                        context += f"Parameters: {method_info['parameters']}\n"
-                        context += f"Returns: {method_info['returns']}\n"
+                        yield f"### {method_name}\n"
+                        yield f"Description: {method_info['description']}\n"
+                        yield f"Parameters: {method_info['parameters']}\n"
+                        yield f"Returns: {method_info['returns']}\n"
                         if 'example' in method_info:
-                            context += f"Example: {method_info['example']}\n"
-                        context += "\n"
-                
+                            yield f"Example: {method_info['example']}\n"
+                        yield "\n"
+
                 # Add common errors if available
                 if 'common_errors' in api_info:
-                    context += "### Common Errors:\n"
+                    yield "### Common Errors:\n"
                     for error in api_info['common_errors']:
-                        context += f"- {error}\n"
-                    context += "\n"
-                
+                        yield f"- {error}\n"
+                    yield "\n"
+
                 # Add best practices if available
                 if 'best_practices' in api_info:
-                    context += "### Best Practices:\n"
+                    yield "### Best Practices:\n"
                     for practice in api_info['best_practices']:
-                        context += f"- {practice}\n"
-                    context += "\n"
-        
+                        yield f"- {practice}\n"
+                    yield "\n"
+
         # Add relevant error information
         if 'relevant_errors' in relevant_docs:
-            context += "## COMMON API ERRORS TO AVOID:\n"
+            yield "## COMMON API ERRORS TO AVOID:\n"
             for error_info in relevant_docs['relevant_errors']:
-                context += f"### {error_info['error_code']}\n"
-                context += f"Description: {error_info['description']}\n"
-                context += f"Context: {error_info['context']}\n"
-                context += f"Solution: {error_info['solution']}\n\n"
-        
+                yield f"### {error_info['error_code']}\n"
+                yield f"Description: {error_info['description']}\n"
+                yield f"Context: {error_info['context']}\n"
+                yield f"Solution: {error_info['solution']}\n\n"
+
         # Add best practices
         if 'best_practices' in relevant_docs:
-            context += "## BEST PRACTICES:\n"
+            yield "## BEST PRACTICES:\n"
             for practice_info in relevant_docs['best_practices']:
-                context += f"### {practice_info['title']}\n"
-                context += f"{practice_info['description']}\n"
+                yield f"### {practice_info['title']}\n"
+                yield f"{practice_info['description']}\n"
                 if 'example' in practice_info:
-                    context += "Example:\n```python\n"
-                    context += f"{practice_info['example']}\n"
-                    context += "```\n\n"
-        
-        return context
\ No newline at end of file
+                    yield "Example:\n```python\n"
+                    yield f"{practice_info['example']}\n"
+                    yield "```\n\n"
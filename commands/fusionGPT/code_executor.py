@@ -1,15 +1,98 @@
 import adsk.core
 import adsk.fusion
-import tempfile
-import os
-import traceback
-import sys
-import importlib.util
-import inspect
+import ast
+import hashlib
+import textwrap
+import types
+from collections import OrderedDict
 import re
 
-app = adsk.core.Application.get()
-ui = app.userInterface
+# Attempt to read DEBUG flag from parent config.
+try:
+    from ... import config
+    DEBUG = config.DEBUG
+except:
+    DEBUG = False
+
+# Resolved lazily so importing this module doesn't touch the Fusion
+# application object during add-in startup
+app = None
+ui = None
+
+
+def _ensure_app():
+    """Initialize the Application/userInterface globals on first use"""
+    global app, ui
+    if ui is None:
+        app = adsk.core.Application.get()
+        ui = app.userInterface
+
+# Translation table mapping common Unicode characters to ASCII
+# equivalents; one translate() pass replaces them all
+_UNICODE_TRANS = str.maketrans({
+    '≈': '~=',  # ≈ (approximately equal to)
+    '≤': '<=',  # ≤ (less than or equal to)
+    '≥': '>=',  # ≥ (greater than or equal to)
+    '°': ' degrees',  # ° (degree symbol)
+    'π': 'pi',  # π (pi)
+    '•': '*',   # • (bullet point)
+    '–': '-',   # – (en dash)
+    '—': '--',  # — (em dash)
+    '‘': "'",   # ' (left single quote)
+    '’': "'",   # ' (right single quote)
+    '“': '"',   # " (left double quote)
+    '”': '"',   # " (right double quote)
+    '×': '*',   # × (multiplication sign)
+    '÷': '/',   # ÷ (division sign)
+    '−': '-',   # − (minus sign)
+})
+
+# Validation patterns, compiled once instead of per validate_code call
+_UNICODE_RE = re.compile(r'[^\x00-\x7F]')
+
+# Runs of consecutive non-ASCII characters, so the rewrite callback
+# fires once per run instead of once per character
+_NONASCII_RUN_RE = re.compile(r'[^\x00-\x7F]+')
+_VALUE_INPUT_RE = re.compile(r'ValueInput\.create\w+\(([^)]+)\)')
+
+# Keywords whose presence suggests the code validates its own inputs
+_REVOLVE_CHECK_SET = frozenset(("check", "validate", "ensure", "verify", "confirm", "test"))
+_EXTRUDE_CHECK_SET = frozenset(("check", "validate", "ensure", "verify", "profiles", "isValid"))
+
+# One alternation over every keyword the rules below look for, so the
+# lowered source is scanned once instead of once per keyword
+_VALIDATE_KEYWORDS_RE = re.compile('|'.join(map(re.escape, sorted(
+    _REVOLVE_CHECK_SET | _EXTRUDE_CHECK_SET | {'revolve', 'extrude', 'axis'}
+))))
+
+# Markdown code fences, with and without the python language tag
+_PYTHON_FENCE_RE = re.compile(r'```python(.*?)```', re.DOTALL)
+_ANY_FENCE_RE = re.compile(r'```(.*?)```', re.DOTALL)
+
+# Don't cache unusually large snippets to bound memory use
+_COMPILE_CACHE_MAX_SIZE = 64 * 1024
+
+# LRU of compiled code objects keyed by a digest of the source, so the
+# cache doesn't retain the (potentially large) source strings themselves
+_CODE_CACHE = OrderedDict()
+_CODE_CACHE_MAX_ENTRIES = 16
+
+# Memoized prepare() results (validation issues + compiled code object)
+_PREPARE_CACHE = OrderedDict()
+
+
+def _compile(code):
+    """Compile a code snippet, caching the result for repeat executions"""
+    key = hashlib.blake2b(code.encode('utf-8'), digest_size=16).digest()
+    code_obj = _CODE_CACHE.get(key)
+    if code_obj is None:
+        code_obj = compile(code, '<llm_generated>', 'exec')
+        _CODE_CACHE[key] = code_obj
+        if len(_CODE_CACHE) > _CODE_CACHE_MAX_ENTRIES:
+            _CODE_CACHE.popitem(last=False)
+    else:
+        _CODE_CACHE.move_to_end(key)
+    return code_obj
 
 def validate_code(code):
     """
@@ -22,104 +105,175 @@ def validate_code(code):
         tuple: (is_valid, issues) - Boolean indicating if code passed validation and list of issues
     """
     issues = []
-    
+    low = code.lower()
+
+    # Track validity while appending instead of re-scanning the issues
+    # list at the end; only the structural checks below are fatal
+    has_non_warning = False
+
+    # Parse once; the AST gives authoritative structure (and catches
+    # syntax errors before exec would)
+    try:
+        tree = ast.parse(code)
+    except SyntaxError as e:
+        issues.append(f"Syntax error: {e}")
+        return False, issues
+
+    has_run = False
+    has_try = False
+    has_app_init = False
+    has_ui_init = False
+    has_handler_func = False
+    has_scope_decl = False
+
+    for node in ast.walk(tree):
+        if isinstance(node, ast.FunctionDef):
+            if node.name == 'run':
+                has_run = True
+            if 'handler' in node.name.lower():
+                has_handler_func = True
+        elif isinstance(node, ast.Try):
+            has_try = True
+        elif isinstance(node, (ast.Global, ast.Nonlocal)):
+            has_scope_decl = True
+        elif isinstance(node, ast.Assign) and len(node.targets) == 1 and isinstance(node.targets[0], ast.Name):
+            target = node.targets[0].id
+            value = node.value
+            if target == 'app' and isinstance(value, ast.Call) \
+                    and isinstance(value.func, ast.Attribute) and value.func.attr == 'get':
+                has_app_init = True
+            elif target == 'ui' and isinstance(value, ast.Attribute) and value.attr == 'userInterface':
+                has_ui_init = True
+
     # Check for basic structure
-    if "def run(context)" not in code:
+    if not has_run:
         issues.append("Missing run(context) function definition")
-    
-    if "try:" not in code or "except" not in code:
+        has_non_warning = True
+
+    if not has_try:
         issues.append("Missing proper error handling (try/except blocks)")
-    
+        has_non_warning = True
+
     # Check for initialization of core variables
-    required_initializations = [
-        "app = adsk.core.Application.get()",
-        "ui = app.userInterface",
-    ]
+    if not has_app_init:
+        issues.append("Missing core initialization: app = adsk.core.Application.get()")
+        has_non_warning = True
+    if not has_ui_init:
+        issues.append("Missing core initialization: ui = app.userInterface")
+        has_non_warning = True
     
-    for init in required_initializations:
-        if init not in code:
-            issues.append(f"Missing core initialization: {init}")
-    
-    # Check for Unicode characters that might cause encoding issues
-    unicode_pattern = re.compile(r'[^\x00-\x7F]')
-    unicode_matches = unicode_pattern.findall(code)
-    if unicode_matches:
+    # Check for Unicode characters that might cause encoding issues;
+    # isascii() is a single C-level scan, so the regex only runs on the
+    # rare non-ASCII input
+    if not code.isascii():
+        unicode_matches = _UNICODE_RE.findall(code)
         issues.append(f"WARNING: Code contains non-ASCII characters that may cause encoding issues: {unicode_matches}")
     
-    # Check for common API issues
-    
+    # Check for common API issues; one pass collects every keyword the
+    # rules care about
+    keywords = set(_VALIDATE_KEYWORDS_RE.findall(low))
+
     # Revolve operation issues (common cause of failures)
-    if "revolve" in code.lower() or "revolvefeatures" in code.lower():
+    if "revolve" in keywords:
         # Check if code contains validation for revolve axis
-        if not any(check in code.lower() for check in [
-            "check", "validate", "ensure", "verify", "confirm", "test"
-        ]) and "axis" in code.lower():
+        if not (keywords & _REVOLVE_CHECK_SET) and "axis" in keywords:
             issues.append("WARNING: Revolve operation without explicit axis validation")
-    
+
     # Extrude operation issues
-    if "extrude" in code.lower() or "extrudefeatures" in code.lower():
-        if not any(check in code.lower() for check in [
-            "check", "validate", "ensure", "verify", "profiles", "isValid"
-        ]):
+    if "extrude" in keywords:
+        if not (keywords & _EXTRUDE_CHECK_SET):
             issues.append("WARNING: Extrude operation without profile validation")
-    
+
     # Check for proper ValueInput usage
-    value_input_pattern = re.compile(r'ValueInput\.create\w+\(([^)]+)\)')
-    for match in value_input_pattern.finditer(code):
+    for match in _VALUE_INPUT_RE.finditer(code):
         value = match.group(1).strip()
         if "createByReal" in match.group(0) and ('"' in value or "'" in value):
             issues.append("WARNING: Using createByReal with string values - use createByString for units")
     
-    # Check for event handler scoping issues
-    if "def " in code and "handler" in code.lower():
-        if "global " not in code and "nonlocal " not in code:
-            issues.append("WARNING: Event handlers defined without proper variable scoping (global/nonlocal)")
+    # Check for event handler scoping issues (from the AST walk, so a
+    # 'handler' in a comment or string no longer trips this)
+    if has_handler_func and not has_scope_decl:
+        issues.append("WARNING: Event handlers defined without proper variable scoping (global/nonlocal)")
     
-    is_valid = len(issues) == 0 or all("WARNING" in issue for issue in issues)
-    return is_valid, issues
+    return not has_non_warning, issues
+
+def prepare(code):
+    """
+    Validate, clean and compile a code snippet in one memoized step
+
+    Args:
+        code (str): The Python code to prepare
+
+    Returns:
+        tuple: (is_valid, issues, code_obj) - code_obj is None when the
+               code failed validation or did not compile
+    """
+    key = hashlib.blake2b(code.encode('utf-8'), digest_size=16).digest()
+    cached = _PREPARE_CACHE.get(key)
+    if cached is not None:
+        _PREPARE_CACHE.move_to_end(key)
+        return cached
+
+    is_valid, issues = validate_code(code)
+
+    # Handle Unicode characters by replacing them with ASCII equivalents
+    # This is a workaround for the encoding issues in Fusion 360's Python environment
+    cleaned_code = remove_unicode_chars(code)
+
+    code_obj = None
+    if is_valid:
+        try:
+            # Compile in memory - no temp file or import machinery needed,
+            # and tracebacks get a recognizable filename. Re-runs of the
+            # same snippet (retries, edit-test loops) hit the compile cache.
+            if len(cleaned_code) <= _COMPILE_CACHE_MAX_SIZE:
+                code_obj = _compile(cleaned_code)
+            else:
+                code_obj = compile(cleaned_code, '<llm_generated>', 'exec')
+        except SyntaxError as e:
+            is_valid = False
+            issues = issues + [f"Syntax error: {e}"]
 
-def execute_code(code):
+    result = (is_valid, issues, code_obj)
+    _PREPARE_CACHE[key] = result
+    if len(_PREPARE_CACHE) > _CODE_CACHE_MAX_ENTRIES:
+        _PREPARE_CACHE.popitem(last=False)
+    return result
+
+
+def execute_code(code, prepared=None):
     """
     Execute Fusion 360 API code provided by the LLM with additional validation
-    
+
     Args:
         code (str): The Python code to execute
-    
+        prepared (tuple, optional): A previous prepare(code) result, to
+                                    skip re-validating and re-compiling
+
     Returns:
         str: Result of the execution
     """
     try:
-        # Validate the code first
-        is_valid, issues = validate_code(code)
-        
-        # Handle Unicode characters by replacing them with ASCII equivalents
-        # This is a workaround for the encoding issues in Fusion 360's Python environment
-        cleaned_code = remove_unicode_chars(code)
-        
+        _ensure_app()
+
+        # Validate and compile (memoized, so repeats are nearly free)
+        is_valid, issues, code_obj = prepared if prepared is not None else prepare(code)
+
         # Log validation results
         if issues:
             validation_message = "Code validation found the following issues:\n- " + "\n- ".join(issues)
-            futil_log = f"Code validation issues: {issues}"
-            
-            # If critical issues exist, alert the user but continue anyway
+
+            # If critical issues exist, abort and report through the return
+            # value - the caller surfaces it in the chat, so no modal dialog
             if not is_valid:
-                ui.messageBox(validation_message + "\n\nAttempting to run anyway, but execution may fail.")
+                app.log(f"Code validation failed: {issues}")
                 return f"VALIDATION FAILED: {validation_message}\n\nExecution aborted."
-        
-        # Create a temporary file with the generated code
-        with tempfile.NamedTemporaryFile(suffix='.py', delete=False, mode='w', encoding='utf-8') as temp_file:
-            # Write the cleaned code to avoid encoding issues
-            temp_file.write(cleaned_code)
-            temp_path = temp_file.name
-        
+
         # Execute the code directly in the Fusion 360 environment
         try:
-            # Import the module dynamically
-            module_name = os.path.basename(temp_path).replace('.py', '')
-            spec = importlib.util.spec_from_file_location(module_name, temp_path)
-            module = importlib.util.module_from_spec(spec)
-            spec.loader.exec_module(module)
-            
+            module = types.ModuleType('fusiongpt_exec')
+            exec(code_obj, module.__dict__)
+
             # Check if there's a run function in the module
             if hasattr(module, 'run'):
                 # Call the run function, passing None as context
@@ -129,13 +283,16 @@ def execute_code(code):
                     message += f" Result: {result}"
                 return message
             else:
-                # If no run function exists, execute the code directly
-                # This is a fallback and less ideal
-                exec(cleaned_code)
+                # Top-level statements already ran when the module executed
                 return "Code executed directly (no run function found)."
-            
+
         except Exception as e:
-            error_msg = f"Error executing code: {str(e)}\n{traceback.format_exc()}"
+            # Formatting a full traceback walks the stack and reads source
+            # from disk, so only pay for it when debugging
+            error_msg = f"Error executing code: {e!r}"
+            if DEBUG:
+                import traceback
+                error_msg += f"\n{traceback.format_exc()}"
             
             # Try to provide more helpful error messages for common issues
             if "revolve" in code.lower() and "tangent" in str(e).lower():
@@ -145,18 +302,17 @@ def execute_code(code):
             elif "boolean" in code.lower() and "body" in str(e).lower():
                 error_msg += "\n\nSUGGESTION: The boolean operation failed. Verify that all target bodies exist and are valid before the operation."
             
-            ui.messageBox(error_msg)
+            # Log asynchronously and return the message; popping a modal
+            # dialog here would block the Fusion main thread
+            app.log(error_msg)
             return error_msg
-        finally:
-            # Clean up the temporary file
-            try:
-                os.unlink(temp_path)
-            except:
-                pass
-        
+
     except Exception as e:
-        error_msg = f"Error preparing code: {str(e)}\n{traceback.format_exc()}"
-        ui.messageBox(error_msg)
+        error_msg = f"Error preparing code: {e!r}"
+        if DEBUG:
+            import traceback
+            error_msg += f"\n{traceback.format_exc()}"
+        app.log(error_msg)
         return error_msg
 
 def remove_unicode_chars(code):
@@ -169,39 +325,25 @@ def remove_unicode_chars(code):
     Returns:
         str: Cleaned code with Unicode characters replaced
     """
-    # Replace common Unicode characters with ASCII equivalents
-    replacements = {
-        '\u2248': '~=',  # ≈ (approximately equal to)
-        '\u2264': '<=',  # ≤ (less than or equal to)
-        '\u2265': '>=',  # ≥ (greater than or equal to)
-        '\u00B0': ' degrees',  # ° (degree symbol)
-        '\u03C0': 'pi',  # π (pi)
-        '\u2022': '*',   # • (bullet point)
-        '\u2013': '-',   # – (en dash)
-        '\u2014': '--',  # — (em dash)
-        '\u2018': "'",   # ' (left single quote)
-        '\u2019': "'",   # ' (right single quote)
-        '\u201C': '"',   # " (left double quote)
-        '\u201D': '"',   # " (right double quote)
-        '\u00D7': '*',   # × (multiplication sign)
-        '\u00F7': '/',   # ÷ (division sign)
-        '\u2212': '-',   # − (minus sign)
-    }
-    
-    # Replace known Unicode characters with ASCII equivalents
-    for unicode_char, ascii_replacement in replacements.items():
-        code = code.replace(unicode_char, ascii_replacement)
-    
-    # Replace any remaining Unicode characters with their descriptions or remove them
-    cleaned_code = ""
-    for char in code:
-        if ord(char) < 128:  # ASCII range
-            cleaned_code += char
-        else:
-            # Replace with ASCII comment noting the removal
-            cleaned_code += f" /* Unicode character {hex(ord(char))} removed */ "
-    
-    return cleaned_code
+    # Most generated code is pure ASCII - skip all replacement work then
+    if code.isascii():
+        return code
+
+    # Replace known Unicode characters with ASCII equivalents in one pass
+    code = code.translate(_UNICODE_TRANS)
+
+    # The translation usually leaves pure ASCII; verify with one C-level
+    # encode instead of a per-character Python loop
+    if code.isascii():
+        return code
+
+    # Replace any remaining Unicode characters with ASCII comments noting
+    # the removal; the regex engine scans in C and only calls back into
+    # Python once per run of non-ASCII characters
+    return _NONASCII_RUN_RE.sub(
+        lambda m: ''.join(f" /* Unicode character {hex(ord(c))} removed */ " for c in m.group(0)),
+        code
+    )
 
 def extract_code(message):
     """
@@ -213,15 +355,25 @@ def extract_code(message):
     Returns:
         str: The extracted code or None
     """
-    if '```python' in message and '```' in message.split('```python', 1)[1]:
-        code = message.split('```python', 1)[1].split('```', 1)[0].strip()
-        # Clean Unicode characters from extracted code
-        return remove_unicode_chars(code)
-    elif '```' in message:
-        # Try to extract code from generic code blocks
-        code = message.split('```', 1)[1].split('```', 1)[0].strip()
-        # Clean Unicode characters from extracted code
-        return remove_unicode_chars(code)
+    # Fast path: most LLM responses open directly with a python fence, so
+    # one find() replaces the regex scan entirely
+    if message.startswith('```python\n'):
+        end = message.find('```', 10)
+        if end != -1:
+            return message[10:end].strip()
+
+    # A single substring check skips both regex scans on the common
+    # fenceless message
+    if '```' not in message:
+        return None
+
+    # Prefer an explicit python fence, then fall back to any code block;
+    # each compiled pattern finds the block in a single scan. The code is
+    # returned raw - prepare()/execute_code own the Unicode cleaning, so
+    # the message isn't rewritten twice.
+    match = _PYTHON_FENCE_RE.search(message) or _ANY_FENCE_RE.search(message)
+    if match:
+        return match.group(1).strip()
     return None
 
 def indent_code(code, spaces=4):
@@ -237,6 +389,5 @@ def indent_code(code, spaces=4):
     """
     if not code:
         return ""
-    
-    indent = " " * spaces
-    return indent + code.replace("\n", f"\n{indent}")
\ No newline at end of file
+
+    return textwrap.indent(code, " " * spaces)
\ No newline at end of file
@@ -1,7 +1,13 @@
+import itertools
 import json
 import adsk.core
 import os
+import re
+import threading
 import traceback
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
 from ...lib import fusionAddInUtils as futil
 from ... import config
 from datetime import datetime
@@ -11,6 +17,20 @@ from . import code_executor
 app = adsk.core.Application.get()
 ui = app.userInterface
 
+# Use orjson for palette message (de)serialization when available - it is
+# several times faster than the stdlib encoder, which matters once
+# streaming pushes many small JSON payloads per response.
+try:
+    import orjson
+
+    _loads = orjson.loads
+
+    def _dumps(obj):
+        return orjson.dumps(obj).decode()
+except ImportError:
+    _loads = json.loads
+    _dumps = json.dumps
+
 # Command configuration
 CMD_ID = f'{config.COMPANY_NAME}_{config.ADDIN_NAME}_PalleteShow'
 CMD_NAME = 'FusionGPT'
@@ -21,12 +41,13 @@ IS_PROMOTED = True  # Make it more visible
 # Using "global" variables by referencing values from /config.py
 PALETTE_ID = config.sample_palette_id
 
-# Specify the full path to the local html. You can also use a web URL
-# such as 'https://www.autodesk.com/'
-PALETTE_URL = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'resources', 'html', 'index.html')
+# Resolve this module's directory once; both resource paths derive from it
+_HERE = os.path.dirname(os.path.abspath(__file__))
 
-# The path function builds a valid OS path. This fixes it to be a valid local URL.
-PALETTE_URL = PALETTE_URL.replace('\\', '/')
+# Specify the full path to the local html. You can also use a web URL
+# such as 'https://www.autodesk.com/'. as_posix() yields the
+# forward-slash form that makes a valid local URL on Windows too.
+PALETTE_URL = Path(_HERE, 'resources', 'html', 'index.html').as_posix()
 
 # Set a default docking behavior for the palette
 PALETTE_DOCKING = adsk.core.PaletteDockingStates.PaletteDockStateRight
@@ -37,22 +58,58 @@ PANEL_ID = 'SolidScriptsAddinsPanel'
 COMMAND_BESIDE_ID = 'ScriptsManagerCommand'
 
 # Resource location for command icons
-ICON_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'resources', '')
+ICON_FOLDER = os.path.join(_HERE, 'resources', '')
 
 # Local list of event handlers used to maintain a reference so
 # they are not released and garbage collected.
 local_handlers = []
 
 # Keep a history of recent code and errors to improve reliability
-recent_code_history = []
-recent_error_history = []
 MAX_HISTORY_ITEMS = 5
+recent_code_history = deque(maxlen=MAX_HISTORY_ITEMS)
+recent_error_history = deque(maxlen=MAX_HISTORY_ITEMS)
+
+# Compiled keyword patterns: each scans its string once instead of one
+# pass per substring.
+# Errors the auto-fix path knows how to retry
+_COMMON_ERR_RE = re.compile(r"tangent|profile|sketch|extrude|revolve|boolean")
+# Phrases suggesting the user is asking to fix a previous failure
+_FIX_KW_RE = re.compile(r"fix|error|failed|issue|problem|not working")
+# Phrases opting out of automatic execution
+_NOEXEC_RE = re.compile(r"don'?t execute|do not execute")
+
+# Worker pool that keeps the multi-second LLM round-trip off the Fusion
+# UI thread so the palette stays responsive while Claude is thinking.
+_executor = ThreadPoolExecutor(max_workers=2)
+
+# Custom event used to hop back onto the Fusion main thread once a worker
+# finishes; code execution and palette updates must not run on workers.
+RESULT_EVENT_ID = f'{config.COMPANY_NAME}_{config.ADDIN_NAME}_PaletteResult'
+
+# In-flight request state. Deliveries get their own ids because one
+# request can produce many events (streamed deltas, result, fix).
+_request_counter = itertools.count(1)
+_delivery_counter = itertools.count(1)
+_pending_results = {}
+
+# Serializes history access between the UI thread and worker threads
+_history_lock = threading.Lock()
+
+# Rapid-fire messages (follow-up edits typed within the window) are
+# coalesced into a single LLM round-trip instead of one call each.
+_COALESCE_WINDOW_S = 0.2
+_coalesce_lock = threading.Lock()
+_coalesce_buffer = []
+_coalesce_timer = None
 
 
 # Executed when add-in is run.
 def start():
-    # Create a command Definition.
-    cmd_def = ui.commandDefinitions.addButtonDefinition(CMD_ID, CMD_NAME, CMD_Description, ICON_FOLDER)
+    # Create a command Definition, reusing a leftover one (e.g. after a
+    # reload without a clean stop) instead of throwing on re-registration.
+    cmd_def = ui.commandDefinitions.itemById(CMD_ID)
+    if not cmd_def:
+        cmd_def = ui.commandDefinitions.addButtonDefinition(CMD_ID, CMD_NAME, CMD_Description, ICON_FOLDER)
 
     # Add command created handler. The function passed here will be executed when the command is executed.
     futil.add_handler(cmd_def.commandCreated, command_created)
@@ -67,9 +124,17 @@ def start():
     # Create the button command control in the UI after the specified existing command.
     control = panel.controls.addCommand(cmd_def, COMMAND_BESIDE_ID, False)
 
-    # Specify if the command is promoted to the main toolbar. 
+    # Specify if the command is promoted to the main toolbar.
     control.isPromoted = IS_PROMOTED
 
+    # Register the custom event that delivers worker results on the main thread.
+    custom_event = app.registerCustomEvent(RESULT_EVENT_ID)
+    futil.add_handler(custom_event, palette_result)
+
+    # Warm up the LLM client (SDK import + TLS handshake) in the background
+    # so the first prompt doesn't pay for it.
+    _executor.submit(llm_client.prewarm)
+
 
 # Executed when add-in is stopped.
 def stop():
@@ -92,6 +157,10 @@ def stop():
     if palette:
         palette.deleteMe()
 
+    # Shut down the worker pool and the result event
+    _executor.shutdown(wait=False)
+    app.unregisterCustomEvent(RESULT_EVENT_ID)
+
 
 # Event handler that is called when the user clicks the command button in the UI.
 def command_created(args: adsk.core.CommandCreatedEventArgs):
@@ -156,139 +225,292 @@ def palette_navigating(args: adsk.core.NavigationEventArgs):
         args.launchExternally = True
 
 
-def add_to_history(item, history_list):
-    """Add an item to a history list, maintaining max size"""
-    history_list.insert(0, item)  # Add at the beginning
-    if len(history_list) > MAX_HISTORY_ITEMS:
-        history_list.pop()  # Remove oldest item
+def _short_err(e):
+    """Compact one-line form of an exception for user-facing strings;
+    the full traceback belongs in the error log only"""
+    return f"{type(e).__name__}: {e}"
 
 
 def get_latest_error_context():
     """Get the most recent error context for RAG"""
     global recent_error_history
-    if recent_error_history:
-        return recent_error_history[0]
+    with _history_lock:
+        if recent_error_history:
+            return recent_error_history[0]
     return None
 
 
 # Use this to handle events sent from javascript in your palette.
 def palette_incoming(html_args: adsk.core.HTMLEventArgs):
-    global recent_code_history, recent_error_history
-    
     try:
         # Parse the incoming data from the HTML
-        data = json.loads(html_args.data)
+        data = _loads(html_args.data)
         user_message = data.get('arg1', '')
-        
-        futil.log(f"Received message: {user_message}", adsk.core.LogLevels.InfoLogLevel)
-        
-        # Check if the user wants to execute code
-        execute_code = "/execute" in user_message.lower()
-        
+
+        # Guard the hot Info logs so the (possibly multi-KB) bodies are
+        # never formatted when Info logging goes nowhere
+        if futil.log_enabled(adsk.core.LogLevels.InfoLogLevel):
+            futil.log(f"Received message: {user_message[:500]}", adsk.core.LogLevels.InfoLogLevel)
+
+        # Acknowledge immediately and hand the slow work (LLM round-trip)
+        # to a worker thread so the palette event loop is never blocked.
+        # Commands go out right away; ordinary prompts sit in a short
+        # coalescing window so rapid follow-ups share one LLM call.
+        req_id = next(_request_counter)
+        um_low = user_message.lower()
+        if um_low.startswith('/') or 'execute' in um_low:
+            _executor.submit(_run_request, req_id, user_message, data)
+        else:
+            _queue_request(req_id, user_message, data)
+        html_args.returnData = _dumps({"status": "pending", "id": req_id})
+
+    except Exception as e:
+        error_msg = f"Error processing message: {_short_err(e)}"
+        futil.log(f"{error_msg}\n{traceback.format_exc()}", adsk.core.LogLevels.ErrorLogLevel)
+        html_args.returnData = f"Error: {error_msg}"
+        with _history_lock:
+            recent_error_history.appendleft(error_msg)
+
+
+def _queue_request(req_id, user_message, data):
+    """Buffer a prompt briefly so rapid follow-ups merge into one request"""
+    global _coalesce_timer
+    with _coalesce_lock:
+        _coalesce_buffer.append((req_id, user_message, data))
+        if _coalesce_timer is not None:
+            _coalesce_timer.cancel()
+        _coalesce_timer = threading.Timer(_COALESCE_WINDOW_S, _flush_requests)
+        _coalesce_timer.daemon = True
+        _coalesce_timer.start()
+
+
+def _flush_requests():
+    """Submit everything in the coalescing buffer as a single request"""
+    global _coalesce_timer
+    with _coalesce_lock:
+        batch = list(_coalesce_buffer)
+        _coalesce_buffer.clear()
+        _coalesce_timer = None
+
+    if not batch:
+        return
+
+    if len(batch) == 1:
+        req_id, user_message, data = batch[0]
+        _executor.submit(_run_request, req_id, user_message, data)
+        return
+
+    # Answer the combined prompt under the newest chat bubble and leave a
+    # short note under the earlier ones
+    for req_id, _, _ in batch[:-1]:
+        _deliver(req_id, {'mode': 'chat', 'response': '*Combined with your next message.*', 'code': None})
+
+    req_id, _, data = batch[-1]
+    merged_message = "\n---\n".join(message for _, message, _ in batch)
+    _executor.submit(_run_request, req_id, merged_message, data)
+
+
+def _deliver(req_id, state):
+    """Stash a worker result and fire the event that picks it up on the main thread"""
+    state['req_id'] = req_id
+    delivery_id = str(next(_delivery_counter))
+    _pending_results[delivery_id] = state
+    app.fireCustomEvent(RESULT_EVENT_ID, delivery_id)
+
+
+def _run_request(req_id, user_message, data):
+    """Worker-thread half of a palette request: everything except Fusion API calls"""
+    try:
+        # Lowercase once; every keyword check below reuses this
+        um_low = user_message.lower()
+
         # If this is an execution command for previous code
-        if user_message.lower().startswith("execute the previous code"):
+        if um_low.startswith("execute the previous code"):
             futil.log("Executing previous code command detected", adsk.core.LogLevels.InfoLogLevel)
-            
+
             # Get the code to execute (either from the data or from history)
             code_to_execute = code_executor.extract_code(data.get('arg2', ''))
-            
-            if not code_to_execute and recent_code_history:
-                code_to_execute = recent_code_history[0]  # Get most recent code
-                
+
+            if not code_to_execute:
+                with _history_lock:
+                    if recent_code_history:
+                        code_to_execute = recent_code_history[0]  # Get most recent code
+
             if not code_to_execute:
-                html_args.returnData = "No code found to execute. Please try again or provide code directly."
+                _deliver(req_id, {'mode': 'chat', 'response': "No code found to execute. Please try again or provide code directly.", 'code': None})
                 return
-            # Log the code for debugging
-            futil.log(f"Executing code:\n{code_to_execute}", adsk.core.LogLevels.InfoLogLevel)
-            
-            # Execute the extracted code
-            execution_result = code_executor.execute_code(code_to_execute)
-            
-            # Store error information if execution failed
-            if "Error" in execution_result:
-                add_to_history(execution_result, recent_error_history)
-            
-            # Return the execution result
-            html_args.returnData = f"Execution Result:\n```\n{execution_result}\n```"
+
+            # Execution itself has to happen on the main thread
+            _deliver(req_id, {'mode': 'execute_only', 'response': '', 'code': code_to_execute})
             return
-            
+
         # Check if the user is asking to fix an error
-        is_fixing_error = any(keyword in user_message.lower() for keyword in 
-                             ["fix", "error", "failed", "issue", "problem", "not working"])
-        
+        is_fixing_error = _FIX_KW_RE.search(um_low) is not None
+
         # Get the most recent error for context if we're fixing something
         error_context = get_latest_error_context() if is_fixing_error else None
-        
-        # Normal message flow - get response from LLM with RAG
-        response = llm_client.process_message(user_message, error_context)
-        
+
+        # Snapshot recent code/errors into a stable context block
+        with _history_lock:
+            history_block, _ = llm_client.build_history_block(
+                recent_code_history, recent_error_history)
+
+        # Normal message flow - get response from LLM with RAG, streaming
+        # each chunk to the palette as it arrives
+        response = llm_client.process_message(
+            user_message, error_context,
+            on_delta=lambda text: _deliver(req_id, {'mode': 'delta', 'text': text}),
+            history_block=history_block)
+
         # Extract code from the response
         code_to_execute = code_executor.extract_code(response)
-        
+
         # Store the generated code in history if it exists
         if code_to_execute:
-            add_to_history(code_to_execute, recent_code_history)
-        
-        # Always try to execute code if present (unless user explicitly says not to)
-        if code_to_execute and ("don't execute" not in user_message.lower() and "do not execute" not in user_message.lower()):
-            # Log the code being executed
-            futil.log(f"Auto-executing code:\n{code_to_execute}", adsk.core.LogLevels.InfoLogLevel)
-            
-            try:
-                # Execute the code
-                execution_result = code_executor.execute_code(code_to_execute)
-                
-                # Store error information if execution failed
-                if "Error" in execution_result:
-                    add_to_history(execution_result, recent_error_history)
-                
-                # Append execution result to the response
-                response += f"\n\n**Execution Result:**\n```\n{execution_result}\n```"
-                
-                # If execution failed, update our error history
-                if "Error" in execution_result:
-                    # Now that we have a real error from execution, we can save it for future reference
-                    add_to_history(execution_result, recent_error_history)
-                    
-                    # If this is a common error, try to generate a better solution
-                    if any(common_error in execution_result for common_error in 
-                          ["tangent", "profile", "sketch", "extrude", "revolve", "boolean"]):
-                        
-                        # Tell the user we're trying again with an improved approach
-                        response += "\n\n**Automatically fixing error...**\n"
-                        
-                        # Generate a new solution with the error context
-                        fixed_response = llm_client.process_message(
-                            f"Fix the error in the previous code: {user_message}", 
-                            execution_result
-                        )
-                        
-                        # Extract the new code
-                        fixed_code = code_executor.extract_code(fixed_response)
-                        
-                        if fixed_code:
-                            # Add the fixed solution to the response
-                            response += "\n\n**Improved Solution:**\n```python\n" + fixed_code + "\n```"
-                            
-                            # Execute the fixed code
-                            fixed_execution_result = code_executor.execute_code(fixed_code)
-                            
-                            # Add the execution result
-                            response += f"\n\n**Fixed Execution Result:**\n```\n{fixed_execution_result}\n```"
-                
-            except Exception as e:
-                error_msg = f"Error during execution: {str(e)}\n{traceback.format_exc()}"
-                futil.log(error_msg, adsk.core.LogLevels.ErrorLogLevel)
-                response += f"\n\n**Execution Error:**\n```\n{error_msg}\n```"
-                add_to_history(error_msg, recent_error_history)
-        
-        html_args.returnData = response
-        
+            with _history_lock:
+                recent_code_history.appendleft(code_to_execute)
+
+        # Execute code if present (unless the user explicitly says not to)
+        should_execute = bool(code_to_execute) and not _NOEXEC_RE.search(um_low)
+
+        _deliver(req_id, {
+            'mode': 'chat',
+            'response': response,
+            'code': code_to_execute if should_execute else None,
+            'user_message': user_message,
+        })
+
     except Exception as e:
-        error_msg = f"Error processing message: {str(e)}\n{traceback.format_exc()}"
-        futil.log(error_msg, adsk.core.LogLevels.ErrorLogLevel)
-        html_args.returnData = f"Error: {error_msg}"
-        add_to_history(error_msg, recent_error_history)
+        error_msg = f"Error processing message: {_short_err(e)}"
+        futil.log(f"{error_msg}\n{traceback.format_exc()}", adsk.core.LogLevels.ErrorLogLevel)
+        with _history_lock:
+            recent_error_history.appendleft(error_msg)
+        _deliver(req_id, {'mode': 'chat', 'response': f"Error: {error_msg}", 'code': None})
+
+
+def _on_fix_ready(req_id, future):
+    """Worker-side callback for a finished auto-fix LLM call"""
+    try:
+        fixed_response = future.result()
+    except Exception as e:
+        futil.log(f"Auto-fix failed: {_short_err(e)}", adsk.core.LogLevels.ErrorLogLevel)
+        return
+
+    # Extract the new code; nothing to report if the model produced none
+    fixed_code = code_executor.extract_code(fixed_response)
+    if not fixed_code:
+        return
+
+    # Execution has to happen on the main thread
+    _deliver(req_id, {'mode': 'fix', 'code': fixed_code})
+
+
+def _send_response(req_id, text):
+    """Push a finished response to the palette chat"""
+    palette = ui.palettes.itemById(PALETTE_ID)
+    if palette:
+        palette.sendInfoToHTML('response', _dumps({'id': req_id, 'text': text}))
+
+
+# Main-thread half of a palette request: runs generated code through the
+# Fusion API and pushes the finished response back to the palette.
+def palette_result(args: adsk.core.CustomEventArgs):
+    state = _pending_results.pop(args.additionalInfo, None)
+    if state is None:
+        return
+    req_id = state['req_id']
+
+    if state['mode'] == 'delta':
+        # A streamed chunk of an in-progress response
+        palette = ui.palettes.itemById(PALETTE_ID)
+        if palette:
+            palette.sendInfoToHTML('delta', _dumps({'id': req_id, 'text': state['text']}))
+        return
+
+    if state['mode'] == 'execute_only':
+        # Log the code for debugging
+        if futil.log_enabled(adsk.core.LogLevels.InfoLogLevel):
+            futil.log(f"Executing code:\n{state['code'][:500]}", adsk.core.LogLevels.InfoLogLevel)
+
+        # Execute the extracted code
+        execution_result = code_executor.execute_code(state['code'])
+
+        # Store error information if execution failed
+        if "Error" in execution_result:
+            with _history_lock:
+                recent_error_history.appendleft(execution_result)
+
+        _send_response(req_id, f"Execution Result:\n```\n{execution_result}\n```")
+        return
+
+    if state['mode'] == 'fix':
+        # Follow-up from a parallel auto-fix: run the improved code and
+        # append it to the chat as its own message
+        fixed_code = state['code']
+        fixed_execution_result = code_executor.execute_code(fixed_code)
+
+        if "Error" in fixed_execution_result:
+            with _history_lock:
+                recent_error_history.appendleft(fixed_execution_result)
+
+        _send_response(req_id, (
+            "**Improved Solution:**\n```python\n" + fixed_code + "\n```"
+            f"\n\n**Fixed Execution Result:**\n```\n{fixed_execution_result}\n```"
+        ))
+        return
+
+    response = state['response']
+    code_to_execute = state['code']
+
+    if code_to_execute:
+        # Log the code being executed
+        if futil.log_enabled(adsk.core.LogLevels.InfoLogLevel):
+            futil.log(f"Auto-executing code:\n{code_to_execute[:500]}", adsk.core.LogLevels.InfoLogLevel)
+
+        try:
+            # Execute the code
+            execution_result = code_executor.execute_code(code_to_execute)
+
+            # Scan the (possibly multi-KB) result once and reuse the flag
+            has_error = "Error" in execution_result
+
+            # Store error information if execution failed
+            if has_error:
+                with _history_lock:
+                    recent_error_history.appendleft(execution_result)
+
+            # Append execution result to the response
+            response += f"\n\n**Execution Result:**\n```\n{execution_result}\n```"
+
+            if has_error:
+                # If this is a common error, try to generate a better
+                # solution. The fix request runs on a worker in parallel
+                # with returning this error report, hiding the second LLM
+                # round-trip; the improved solution arrives as a follow-up
+                # chat message once it is ready.
+                if _COMMON_ERR_RE.search(execution_result):
+
+                    # Tell the user we're trying again with an improved approach
+                    response += "\n\n**Automatically fixing error...**\n"
+
+                    fix_future = _executor.submit(
+                        llm_client.process_message,
+                        f"Fix the error in the previous code: {state['user_message']}",
+                        execution_result
+                    )
+                    fix_future.add_done_callback(
+                        lambda future, rid=req_id: _on_fix_ready(rid, future))
+
+        except Exception as e:
+            # Keep the user-facing string short; the full traceback only
+            # goes to the error log
+            error_msg = f"Error during execution: {_short_err(e)}"
+            futil.log(f"{error_msg}\n{traceback.format_exc()}", adsk.core.LogLevels.ErrorLogLevel)
+            response += f"\n\n**Execution Error:**\n```\n{error_msg}\n```"
+            with _history_lock:
+                recent_error_history.appendleft(error_msg)
+
+    _send_response(req_id, response)
 
 
 # This event handler is called when the command terminates.
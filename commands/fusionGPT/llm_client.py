@@ -1,19 +1,196 @@
-import os, json, anthropic
-from dotenv import load_dotenv
+import os, json
+import atexit
+import functools
+import hashlib
+import re
+import shelve
+import threading
+import time
+from collections import OrderedDict
 from ... import config
+from ...lib import fusionAddInUtils as futil
 import traceback
 from . import api_docs_retriever
 
-# Load environment variables and get API key
-load_dotenv()
-api_key = os.getenv("ANTHROPIC_API_KEY") or config.ANTHROPIC_API_KEY 
-if not api_key: raise ValueError("Anthropic API key not set")
+# The Anthropic SDK (with its httpx/pydantic dependency tree) is imported
+# lazily on first use, so loading the add-in doesn't pay for it when the
+# palette is never opened. The missing-key error also moves to first use
+# instead of failing the whole add-in at import.
+_client = None
+_client_lock = threading.Lock()
 
-# Initialize Anthropic client
-client = anthropic.Anthropic(api_key=api_key)
 
-# Initialize API documentation retriever
-api_docs = api_docs_retriever.FusionAPIDocs()
+@functools.cache
+def _api_key():
+    """Resolve the API key once; .env and config are only consulted on
+    the first call, not on every add-in reload path through this module"""
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    api_key = os.getenv("ANTHROPIC_API_KEY") or config.ANTHROPIC_API_KEY
+    if not api_key:
+        raise ValueError("Anthropic API key not set")
+    return api_key
+
+
+def _get_client():
+    """Create the shared Anthropic client on first use"""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is not None:
+                return _client
+            import anthropic
+            import httpx
+
+            # Persistent HTTP client shared across API calls: keep-alive
+            # connections amortize TLS/TCP setup, and HTTP/2 (when the h2
+            # package is installed) lets concurrent requests multiplex
+            # over one connection.
+            limits = httpx.Limits(max_keepalive_connections=4, keepalive_expiry=60)
+            timeout = httpx.Timeout(60.0, connect=5.0)
+            try:
+                http_client = httpx.Client(http2=True, limits=limits, timeout=timeout)
+            except ImportError:
+                # h2 not installed; HTTP/1.1 keep-alive still pools connections
+                http_client = httpx.Client(limits=limits, timeout=timeout)
+            atexit.register(http_client.close)
+
+            # Retry transient failures instead of surfacing them to the palette
+            _client = anthropic.Anthropic(api_key=_api_key(), http_client=http_client, max_retries=2)
+    return _client
+
+# Initialize API documentation retriever (shared process-wide instance)
+api_docs = api_docs_retriever.get_docs()
+
+# Model used for every request; part of the cache keys below so a model
+# upgrade naturally invalidates stale cached answers
+_MODEL_NAME = "claude-3-7-sonnet-latest"
+
+# Cache of recent completions keyed by a hash of the full prompt, so
+# asking the same question twice skips the API round-trip entirely.
+# LRU-evicted OrderedDict; entries expire after _RESPONSE_CACHE_TTL seconds.
+_RESPONSE_CACHE = OrderedDict()
+_RESPONSE_CACHE_MAX_ENTRIES = 256
+_RESPONSE_CACHE_TTL = 15 * 60
+
+# Serializes access to the in-memory cache tiers; concurrent
+# process_message calls are the steady state with the worker pool
+_cache_lock = threading.Lock()
+
+# Fuzzy tier of the response cache: token sets of recent prompts, so a
+# minor rewording of a question still reuses the answer. A plain Jaccard
+# scan stands in for a MinHash LSH index - at this cache size the linear
+# scan over frozensets is cheaper than carrying the datasketch dependency.
+_FUZZY_JACCARD_THRESHOLD = 0.92
+_FUZZY_CACHE_MAX_ENTRIES = 128
+_fuzzy_cache = OrderedDict()
+
+# Persistent second tier for the response cache, shared across Fusion
+# sessions via a shelve DB in the user's home directory
+_PERSIST_CACHE_PATH = os.path.expanduser("~/.fusiongpt_cache.db")
+_shelf = None
+_shelf_failed = False
+_shelf_lock = threading.Lock()
+
+
+def _get_shelf():
+    """Open the on-disk response cache on first use; None when unavailable"""
+    global _shelf, _shelf_failed
+    if _shelf is None and not _shelf_failed:
+        with _shelf_lock:
+            if _shelf is None and not _shelf_failed:
+                try:
+                    _shelf = shelve.open(_PERSIST_CACHE_PATH)
+                    atexit.register(_shelf.close)
+                except Exception:
+                    # A corrupt or locked DB must not break the palette
+                    _shelf_failed = True
+    return _shelf
+
+# Don't cache prompts whose answer depends on when they are asked
+_VOLATILE_RE = re.compile(r"\b(?:now|random|current|today)\b")
+
+# Modelling verbs that trigger the code-task enhancement below
+_ENHANCE_KW_RE = re.compile(r"create|make|generate|model|build|design", re.IGNORECASE)
+
+# Template wrapped around modelling requests; built once, formatted per call
+_ENHANCE_TMPL = """
+Create reliable Fusion 360 Python code that will accomplish this task:
+
+{msg}
+
+IMPORTANT:
+1. Your code must be COMPLETE and EXECUTABLE
+2. Include VALIDATION CHECKS before each geometry operation
+3. Use DEFENSIVE CODING to prevent errors
+4. Follow ALL the API documentation guidance
+5. Add helpful comments explaining your approach
+
+The code WILL be directly executed in Fusion 360, so it must be robust.
+"""
+
+# Ceiling on the RAG context fed into the system prompt, in characters
+# (roughly 6k tokens), so an unusually broad retrieval can never push the
+# request over the model window and into an error/retry cycle
+_API_CONTEXT_MAX_CHARS = 24000
+
+# Memoized history pack: (source key, text, digest). Rebuilt only when
+# the histories actually change.
+_hist_memo = (None, "", "")
+
+
+def _build_enhanced_message(message):
+    """Wrap modelling requests in the enhancement template; one compiled
+    case-insensitive scan, no lowered copy of the message"""
+    if _ENHANCE_KW_RE.search(message):
+        return _ENHANCE_TMPL.format(msg=message)
+    return message
+
+
+def prewarm():
+    """Build the client and open a connection off the critical path.
+
+    Meant to run on a background thread at add-in start, so the first
+    real request skips the SDK import, client construction and the TLS
+    handshake. Best-effort: failures surface on the first real call.
+    """
+    try:
+        _get_client().messages.count_tokens(
+            model=_MODEL_NAME,
+            messages=[{"role": "user", "content": "ping"}],
+        )
+    except Exception:
+        pass
+
+
+def build_history_block(code_hist, err_hist):
+    """Build a deterministic context block from recent code and errors.
+
+    Items are ordered oldest-first so a new entry only appends bytes,
+    keeping the block byte-identical across turns whenever the history
+    hasn't changed - which lets Anthropic's prefix cache hit on it.
+
+    Returns:
+        tuple[str, str]: The block text and a digest identifying its version
+    """
+    global _hist_memo
+    key = (tuple(code_hist), tuple(err_hist))
+    if key == _hist_memo[0]:
+        return _hist_memo[1], _hist_memo[2]
+
+    parts = []
+    if code_hist:
+        parts.append("RECENTLY GENERATED CODE (oldest first):")
+        parts.extend(f"```python\n{code}\n```" for code in reversed(code_hist))
+    if err_hist:
+        parts.append("RECENT EXECUTION ERRORS (oldest first):")
+        parts.extend(reversed(err_hist))
+
+    text = "\n\n".join(parts)
+    digest = hashlib.md5(text.encode('utf-8')).hexdigest()
+    _hist_memo = (key, text, digest)
+    return text, digest
 
 # Base system message defining assistant behavior
 BASE_SYSTEM_MESSAGE = """You are a Fusion 360 API expert. Generate executable Python code that creates 3D models using the Fusion 360 API.
@@ -58,68 +235,152 @@ def run(context):
 Remember, your code will be directly executed in Fusion 360. It must work reliably.
 """
 
-def process_message(message, error_context=None):
+def process_message(message, error_context=None, on_delta=None, history_block=""):
     """
     Process user message using Anthropic Claude with RAG from API documentation
-    
+
     Args:
         message (str): The user's message
         error_context (str, optional): Additional error context
-        
+        on_delta (callable, optional): Called with each streamed text chunk
+            as it arrives, so the caller can show output before the full
+            response is generated
+        history_block (str, optional): Stable conversation-history pack from
+            build_history_block, placed between the cached system prompt and
+            the dynamic context
+
     Returns:
         str: The response from Claude
     """
-    try:
-        # Retrieve relevant API documentation
-        relevant_docs = api_docs.retrieve_relevant_docs(message)
-        api_context = api_docs.format_as_context(relevant_docs)
-        
-        # If error context is provided, try to find solutions
-        error_solution = None
-        if error_context:
-            error_solution = api_docs.retrieve_error_solution(error_context)
-        
-        # Create enhanced system message with RAG context
-        enhanced_system_message = BASE_SYSTEM_MESSAGE
-        
-        if api_context:
-            enhanced_system_message += "\n\n" + api_context
-        
-        if error_solution:
-            enhanced_system_message += f"\n\nATTENTION - PREVIOUS ERROR TO FIX:\n{error_context}\n\nSOLUTION:\n{error_solution['solution']}\n"
-        
-        # Enhance the user message if it doesn't explicitly ask for code
-        if any(keyword in message.lower() for keyword in ["create", "make", "generate", "model", "build", "design"]):
-            enhanced_message = f"""
-Create reliable Fusion 360 Python code that will accomplish this task:
+    # Retrieve relevant API documentation; the message and any error
+    # context share a single retrieval pass
+    relevant_docs = api_docs.retrieve_relevant_docs_batch((message, error_context))
+    api_context = api_docs.format_as_context(relevant_docs)
 
-{message}
+    # Budget the context locally; trimming on a blank line keeps the
+    # surviving sections well-formed
+    if len(api_context) > _API_CONTEXT_MAX_CHARS:
+        truncated = api_context[:_API_CONTEXT_MAX_CHARS]
+        cut = truncated.rfind('\n\n')
+        api_context = truncated[:cut] if cut > 0 else truncated
+    
+    # If error context is provided, try to find solutions
+    error_solution = None
+    if error_context:
+        error_solution = api_docs.retrieve_error_solution(error_context)
+    
+    # Build the system prompt as content blocks: the static base prompt
+    # first with a cache_control breakpoint so Anthropic's prompt cache
+    # reuses its prefill across calls, then the per-request RAG context
+    # in a separate uncached block (static first, dynamic last).
+    system_blocks = [{
+        "type": "text",
+        "text": BASE_SYSTEM_MESSAGE,
+        "cache_control": {"type": "ephemeral"},
+    }]
 
-IMPORTANT:
-1. Your code must be COMPLETE and EXECUTABLE
-2. Include VALIDATION CHECKS before each geometry operation
-3. Use DEFENSIVE CODING to prevent errors
-4. Follow ALL the API documentation guidance
-5. Add helpful comments explaining your approach
+    # The history pack changes rarely and append-only, so it gets its
+    # own cache breakpoint between the static prompt and the dynamic tail
+    if history_block:
+        system_blocks.append({
+            "type": "text",
+            "text": history_block,
+            "cache_control": {"type": "ephemeral"},
+        })
 
-The code WILL be directly executed in Fusion 360, so it must be robust.
-"""
-        else:
-            enhanced_message = message
-            
-        # Call the API with explicit error handling
-        try:
-            response = client.messages.create(
-                model="claude-3-7-sonnet-latest",
-                system=enhanced_system_message,
-                max_tokens=4000,
-                messages=[{"role": "user", "content": enhanced_message}]
-            )
-            return response.content[0].text
-        except Exception as api_error:
-            error_details = f"API Error: {str(api_error)}\n{traceback.format_exc()}"
-            return f"Error communicating with Claude: {error_details}"
-            
-    except Exception as e:
-        error_details = f"Processing Error: {str(e)}\n{traceback.format_exc()}"
-        return f"Error processing message: {error_details}"
\ No newline at end of file
+    # One join instead of repeated += on a multi-KB string
+    error_block = ""
+    if error_solution:
+        error_block = f"ATTENTION - PREVIOUS ERROR TO FIX:\n{error_context}\n\nSOLUTION:\n{error_solution['solution']}\n"
+
+    dynamic_context = "\n\n".join(part for part in (api_context, error_block) if part)
+
+    if dynamic_context:
+        system_blocks.append({"type": "text", "text": dynamic_context})
+    
+    enhanced_message = _build_enhanced_message(message)
+
+    # Check the local response cache before going to the network. The
+    # key covers the dynamic context too, since the same question with
+    # a different error context deserves a fresh answer.
+    cacheable = not _VOLATILE_RE.search(message.lower())
+    cache_key = _MODEL_NAME + ':' + hashlib.blake2b(
+        (history_block + "\x00" + dynamic_context + "\x00" + enhanced_message).encode('utf-8'),
+        digest_size=16
+    ).hexdigest()
+    if cacheable:
+        with _cache_lock:
+            cached = _RESPONSE_CACHE.get(cache_key)
+            if cached is not None:
+                timestamp, cached_text = cached
+                if time.monotonic() - timestamp < _RESPONSE_CACHE_TTL:
+                    _RESPONSE_CACHE.move_to_end(cache_key)
+                    return cached_text
+                del _RESPONSE_CACHE[cache_key]
+
+        # Fall back to the cross-session disk tier
+        shelf = _get_shelf()
+        if shelf is not None:
+            with _shelf_lock:
+                cached_text = shelf.get(cache_key)
+            if cached_text is not None:
+                with _cache_lock:
+                    _RESPONSE_CACHE[cache_key] = (time.monotonic(), cached_text)
+                return cached_text
+
+        # Fuzzy tier: a near-identical rewording of a recent prompt
+        # (same history and context) reuses its completion. Snapshot the
+        # entries so workers storing new ones don't mutate the dict
+        # under this iteration.
+        message_tokens = frozenset(message.lower().split())
+        context_fp = hash((history_block, dynamic_context))
+        if message_tokens:
+            with _cache_lock:
+                fuzzy_entries = list(_fuzzy_cache.values())
+            for tokens, entry_fp, cached_text in fuzzy_entries:
+                if entry_fp != context_fp:
+                    continue
+                union = len(message_tokens | tokens)
+                if union and len(message_tokens & tokens) / union >= _FUZZY_JACCARD_THRESHOLD:
+                    return cached_text
+
+    # Call the API with explicit error handling
+    try:
+        # Stream the response so the first tokens are available in
+        # ~hundreds of ms instead of waiting for the full generation
+        buf = []
+        with _get_client().messages.stream(
+            model=_MODEL_NAME,
+            system=system_blocks,
+            max_tokens=4000,
+            messages=[{"role": "user", "content": enhanced_message}]
+        ) as stream:
+            for text in stream.text_stream:
+                buf.append(text)
+                if on_delta:
+                    on_delta(text)
+            final_message = stream.get_final_message()
+        cache_read = getattr(final_message.usage, 'cache_read_input_tokens', None)
+        if cache_read:
+            futil.log(f'Prompt cache hit: {cache_read} input tokens read from cache')
+        response_text = "".join(buf)
+        if cacheable:
+            with _cache_lock:
+                _RESPONSE_CACHE[cache_key] = (time.monotonic(), response_text)
+                if len(_RESPONSE_CACHE) > _RESPONSE_CACHE_MAX_ENTRIES:
+                    _RESPONSE_CACHE.popitem(last=False)
+                _fuzzy_cache[cache_key] = (message_tokens, context_fp, response_text)
+                if len(_fuzzy_cache) > _FUZZY_CACHE_MAX_ENTRIES:
+                    _fuzzy_cache.popitem(last=False)
+            shelf = _get_shelf()
+            if shelf is not None:
+                with _shelf_lock:
+                    shelf[cache_key] = response_text
+        return response_text
+    except Exception as api_error:
+        # Walking and formatting the full stack reads source files from
+        # disk; only do it when debugging
+        error_details = f"API Error: {api_error}"
+        if futil.DEBUG:
+            error_details += "\n" + traceback.format_exc()
+        return f"Error communicating with Claude: {error_details}"
\ No newline at end of file
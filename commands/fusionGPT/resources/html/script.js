@@ -177,6 +177,117 @@ function scrollToBottom() {
 // Store the last code block for reuse
 let lastCodeBlock = "";
 
+// Requests the add-in has acknowledged but not yet answered, keyed by
+// request id; each value is the list of indicators to clear on arrival.
+const pendingRequests = {};
+
+// Remove a loading/status indicator if it is still in the chat
+function removeIndicator(element) {
+    if (element && element.parentNode) {
+        element.parentNode.removeChild(element);
+    }
+}
+
+// Render a finished response from the add-in into the chat
+function renderResponse(response) {
+    // Check if response contains code that will be executed
+    if (response.includes("```python")) {
+        // Add an executing status indicator
+        const executingIndicator = addStatusIndicator("executing", "Executing code...");
+
+        // Add the response
+        addSystemMessage(response);
+
+        // Check if auto-fixing is happening
+        if (response.includes("**Automatically fixing error**") ||
+            response.includes("**Improved Solution:**")) {
+            // Add a fixing indicator
+            const fixingIndicator = addStatusIndicator("fixing", "Auto-fixing API errors...");
+
+            // Remove indicators after a delay
+            setTimeout(() => {
+                removeIndicator(executingIndicator);
+                removeIndicator(fixingIndicator);
+            }, 3000);
+        } else {
+            // Just remove the executing indicator after a delay
+            setTimeout(() => {
+                removeIndicator(executingIndicator);
+            }, 2000);
+        }
+    } else {
+        // Just add the response without execution indicator
+        addSystemMessage(response);
+    }
+
+    // Check if a new code block exists in the response
+    const newCodeBlocks = document.querySelectorAll('.system-message:last-of-type .code-block code');
+    if (newCodeBlocks.length > 0) {
+        lastCodeBlock = newCodeBlocks[newCodeBlocks.length - 1].textContent;
+    }
+
+    // Only add execute button if code is present but wasn't executed
+    // automatically; auto-fix follow-ups label their result block
+    // "**Fixed Execution Result:**" and must not get a button either
+    if (response.includes("```python") &&
+        !response.includes("**Execution Result:**") &&
+        !response.includes("**Fixed Execution Result:**")) {
+        addExecuteButton();
+    }
+}
+
+// Live draft bubbles for streamed responses, keyed by request id
+const streamingMessages = {};
+
+// Append a streamed chunk to the draft bubble for a request, creating
+// the bubble on the first chunk
+function appendDelta(id, text) {
+    let draft = streamingMessages[id];
+    if (!draft) {
+        const messageDiv = addSystemMessage("");
+        draft = streamingMessages[id] = {
+            messageDiv: messageDiv,
+            contentDiv: messageDiv.querySelector(".content"),
+            text: ""
+        };
+    }
+    draft.text += text;
+    draft.contentDiv.textContent = draft.text;
+    scrollToBottom();
+}
+
+// Handle data pushed from the add-in via palette.sendInfoToHTML. Requests
+// are acknowledged immediately and answered later through this channel so
+// the Fusion UI thread is never blocked on the LLM.
+window.fusionJavaScriptHandler = {
+    handle: function (action, data) {
+        try {
+            if (action === "delta") {
+                const payload = JSON.parse(data);
+                appendDelta(payload.id, payload.text);
+            } else if (action === "response") {
+                const payload = JSON.parse(data);
+                const indicators = pendingRequests[payload.id];
+                if (indicators) {
+                    delete pendingRequests[payload.id];
+                    indicators.forEach(removeIndicator);
+                }
+                // Replace the plain-text draft with the fully formatted response
+                const draft = streamingMessages[payload.id];
+                if (draft) {
+                    delete streamingMessages[payload.id];
+                    removeIndicator(draft.messageDiv);
+                }
+                renderResponse(payload.text);
+            }
+        } catch (e) {
+            console.error(e);
+            return "FAILED";
+        }
+        return "OK";
+    }
+};
+
 // Function to send a message to the server
 function sendMessage() {
     const input = document.getElementById("inputBox");
@@ -210,77 +321,41 @@ function sendMessage() {
     autoResizeTextarea(input);
     input.focus();
     
-    // Send data to Fusion 360
+    // Send data to Fusion 360. The add-in acknowledges right away with a
+    // pending id; the real answer arrives later via fusionJavaScriptHandler.
     adsk.fusionSendData("chatMessage", JSON.stringify(data)).then((response) => {
-        // Remove the loading and status indicators
-        const chatBox = document.getElementById("chatBox");
-        chatBox.removeChild(loadingIndicator);
-        chatBox.removeChild(statusIndicator);
-        
-        // Check if response contains code that will be executed
-        if (response.includes("```python")) {
-            // Add an executing status indicator
-            const executingIndicator = addStatusIndicator("executing", "Executing code...");
-            
-            // Add the response
-            addSystemMessage(response);
-            
-            // Check if auto-fixing is happening
-            if (response.includes("**Automatically fixing error**") || 
-                response.includes("**Improved Solution:**")) {
-                // Add a fixing indicator
-                const fixingIndicator = addStatusIndicator("fixing", "Auto-fixing API errors...");
-                
-                // Remove indicators after a delay
-                setTimeout(() => {
-                    if (executingIndicator && executingIndicator.parentNode) {
-                        executingIndicator.parentNode.removeChild(executingIndicator);
-                    }
-                    if (fixingIndicator && fixingIndicator.parentNode) {
-                        fixingIndicator.parentNode.removeChild(fixingIndicator);
-                    }
-                }, 3000);
-            } else {
-                // Just remove the executing indicator after a delay
-                setTimeout(() => {
-                    if (executingIndicator && executingIndicator.parentNode) {
-                        executingIndicator.parentNode.removeChild(executingIndicator);
-                    }
-                }, 2000);
-            }
-        } else {
-            // Just add the response without execution indicator
-            addSystemMessage(response);
+        let ack = null;
+        try {
+            ack = JSON.parse(response);
+        } catch (e) {
+            // Not JSON - a synchronous error string from the add-in
         }
-        
-        // Check if a new code block exists in the response
-        const newCodeBlocks = document.querySelectorAll('.system-message:last-of-type .code-block code');
-        if (newCodeBlocks.length > 0) {
-            lastCodeBlock = newCodeBlocks[newCodeBlocks.length - 1].textContent;
-        }
-        
-        // Only add execute button if code is present but wasn't executed automatically
-        if (response.includes("```python") && !response.includes("**Execution Result:**")) {
-            addExecuteButton();
+
+        if (ack && ack.status === "pending") {
+            // Keep the indicators up until the pushed response arrives
+            pendingRequests[ack.id] = [loadingIndicator, statusIndicator];
+            return;
         }
+
+        // Synchronous reply (e.g. a parse error) - render it directly
+        removeIndicator(loadingIndicator);
+        removeIndicator(statusIndicator);
+        renderResponse(response);
     }).catch((error) => {
         // Remove the loading indicators
-        const chatBox = document.getElementById("chatBox");
-        chatBox.removeChild(loadingIndicator);
-        chatBox.removeChild(statusIndicator);
-        
+        removeIndicator(loadingIndicator);
+        removeIndicator(statusIndicator);
+
         // Add error status
         const errorIndicator = addStatusIndicator("error", "Error: Could not process your request");
-        
+
         // Add error message
         addSystemMessage("Error: Could not process your request. Please try again.");
         console.error(error);
-        
+
         // Remove error indicator after a few seconds
         setTimeout(() => {
-            if (errorIndicator && errorIndicator.parentNode) {
-                errorIndicator.parentNode.removeChild(errorIndicator);
-            }
+            removeIndicator(errorIndicator);
         }, 5000);
     });
 }
@@ -316,33 +391,37 @@ function addExecuteButton() {
             arg2: lastCodeBlock // Pass the actual code to execute
         };
         
-        // Send data to Fusion 360
+        // Send data to Fusion 360; the result is pushed back asynchronously
         adsk.fusionSendData("chatMessage", JSON.stringify(data)).then((response) => {
-            // Remove the executing indicator
-            if (executingIndicator && executingIndicator.parentNode) {
-                executingIndicator.parentNode.removeChild(executingIndicator);
+            let ack = null;
+            try {
+                ack = JSON.parse(response);
+            } catch (e) {
+                // Not JSON - a synchronous error string from the add-in
+            }
+
+            if (ack && ack.status === "pending") {
+                pendingRequests[ack.id] = [executingIndicator];
+                return;
             }
-            
-            // Add the actual response
+
+            // Synchronous reply - render it directly
+            removeIndicator(executingIndicator);
             addSystemMessage(response);
         }).catch((error) => {
             // Remove the executing indicator
-            if (executingIndicator && executingIndicator.parentNode) {
-                executingIndicator.parentNode.removeChild(executingIndicator);
-            }
-            
+            removeIndicator(executingIndicator);
+
             // Add error status
             const errorIndicator = addStatusIndicator("error", "Error: Could not execute the code");
-            
+
             // Add error message
             addSystemMessage("Error: Could not execute the code. Please try again.");
             console.error(error);
-            
+
             // Remove error indicator after a few seconds
             setTimeout(() => {
-                if (errorIndicator && errorIndicator.parentNode) {
-                    errorIndicator.parentNode.removeChild(errorIndicator);
-                }
+                removeIndicator(errorIndicator);
             }, 5000);
         });
     };
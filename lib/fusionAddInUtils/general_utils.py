@@ -24,6 +24,19 @@ except:
     DEBUG = False
 
 
+def log_enabled(level: adsk.core.LogLevels = adsk.core.LogLevels.InfoLogLevel) -> bool:
+    """Utility function to check whether a log call at this level would
+    reach a Fusion log sink.
+
+    Lets hot code paths skip building large log strings entirely when
+    the message would only go to the IDE console.
+
+    Arguments:
+    level -- The logging severity level to check.
+    """
+    return DEBUG or level == adsk.core.LogLevels.ErrorLogLevel
+
+
 def log(message: str, level: adsk.core.LogLevels = adsk.core.LogLevels.InfoLogLevel, force_console: bool = False):
     """Utility function to easily handle logging in your app.
 